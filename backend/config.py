@@ -1,3 +1,8 @@
+import os
+
 CHUNK_SIZE = 300
 CHUNK_OVERLAP = 50
-MAX_CHUNK_CHARS = 3000
\ No newline at end of file
+MAX_CHUNK_CHARS = 3000
+
+# where the local Ollama server is listening
+OLLAMA_HOST = os.getenv("OLLAMA_HOST", "http://localhost:11434")
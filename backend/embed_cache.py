@@ -0,0 +1,113 @@
+"""
+Persistent on-disk cache for embeddings, backed by SQLite.
+
+Identical chunks show up across ingests (license boilerplate, standard
+disclaimers, re-uploads of revised documents) and across server restarts.
+The in-request dedupe only helps within one call, so this module keeps a
+durable cache keyed by (model, chunk hash) that lets embed_texts skip
+Ollama entirely for anything seen before.
+
+Vectors are stored as raw little-endian float32 bytes (numpy tobytes),
+which is far smaller and faster to round-trip than JSON. The key embeds
+the model name so switching embedding models never serves stale vectors.
+"""
+
+import hashlib
+import os
+import sqlite3
+import threading
+from typing import Dict, List
+import numpy as np
+
+# overridable so deployments can point the cache at persistent storage
+CACHE_PATH = os.getenv("EMBED_CACHE_PATH", "./embed_cache.db")
+
+# SQLite caps bound parameters per statement, so lookups go in slices
+_SELECT_BATCH = 500
+
+_conn = None
+_lock = threading.Lock()
+
+
+def _get_conn() -> sqlite3.Connection:
+    """
+    Lazily open (and initialise) the cache database, shared module-wide.
+    """
+    global _conn
+    if _conn is None:
+        _conn = sqlite3.connect(CACHE_PATH, check_same_thread=False)
+        _conn.execute("PRAGMA journal_mode=WAL")
+        _conn.execute("PRAGMA synchronous=NORMAL")
+        _conn.execute("CREATE TABLE IF NOT EXISTS emb(key BLOB PRIMARY KEY, vec BLOB NOT NULL)")
+        _conn.commit()
+    return _conn
+
+
+def make_key(model: str, text: str) -> bytes:
+    """
+    Cache key for a (model, normalised text) pair.
+    """
+    return hashlib.blake2b(f"{model}:{text}".encode(), digest_size=16).digest()
+
+
+def get_many(keys: List[bytes]) -> Dict[bytes, List[float]]:
+    """
+    Look up a batch of keys. Returns {key: vector} for the hits only.
+
+    Cache problems are swallowed (a broken cache should slow us down,
+    never take the API down).
+    """
+    if not keys:
+        return {}
+
+    hits: Dict[bytes, List[float]] = {}
+
+    try:
+        conn = _get_conn()
+        with _lock:
+            for i in range(0, len(keys), _SELECT_BATCH):
+                batch = keys[i:i + _SELECT_BATCH]
+                placeholders = ",".join("?" * len(batch))
+                rows = conn.execute(
+                    f"SELECT key, vec FROM emb WHERE key IN ({placeholders})", batch
+                ).fetchall()
+                for key, vec in rows:
+                    hits[key] = np.frombuffer(vec, dtype=np.float32).tolist()
+    except Exception:
+        return {}
+
+    return hits
+
+
+def put_many(items: Dict[bytes, List[float]]) -> None:
+    """
+    Store a batch of {key: vector} entries (upsert).
+    """
+    if not items:
+        return
+
+    try:
+        rows = [
+            (key, np.asarray(vec, dtype=np.float32).tobytes())
+            for key, vec in items.items()
+        ]
+        conn = _get_conn()
+        with _lock:
+            conn.executemany("INSERT OR REPLACE INTO emb(key, vec) VALUES (?, ?)", rows)
+            conn.commit()
+    except Exception:
+        pass
+
+
+if __name__ == "__main__":
+    print("=== Manual test for embed_cache.py ===\n")
+
+    key_a = make_key("test-model", "some chunk text")
+    key_b = make_key("test-model", "another chunk")
+
+    put_many({key_a: [0.1, 0.2, 0.3], key_b: [0.4, 0.5, 0.6]})
+
+    found = get_many([key_a, key_b, make_key("test-model", "never stored")])
+    print("Hits:", len(found), "(should be 2)")
+    for key, vec in found.items():
+        print(f"  {key.hex()}: {vec}")
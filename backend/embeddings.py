@@ -4,23 +4,192 @@ Utility functions for generating embeddings using a local Ollama model.
 This module provides:
 - A custom EmbeddingError exception
 - A function to embed a single piece of text
-- A function to embed a list of texts (chunks)
+- A function to embed a list of texts (chunks) in one batched call
+- An async variant that fires sub-batches at Ollama concurrently
 """
 
-from typing import List
+import asyncio
+import functools
+import hashlib
+from typing import Dict, List, Tuple
+import httpx
+import numpy as np
 import ollama
-from backend.config import MAX_CHUNK_CHARS
+from backend import embed_cache
+from backend.config import MAX_CHUNK_CHARS, OLLAMA_HOST
 
 EMBEDDING_MODEL = "nomic-embed-text"
 
+# module-scoped clients with a keep-alive connection pool: the ollama client
+# is built on httpx and forwards these kwargs straight to httpx.Client, so
+# every embed call reuses warm TCP connections instead of re-handshaking
+_HTTPX_LIMITS = httpx.Limits(
+    max_keepalive_connections=40,
+    max_connections=100,
+    keepalive_expiry=30,
+)
+_HTTPX_TIMEOUT = httpx.Timeout(300.0, connect=10.0)
+
+_client = ollama.Client(host=OLLAMA_HOST, timeout=_HTTPX_TIMEOUT, limits=_HTTPX_LIMITS)
+_async_client = ollama.AsyncClient(host=OLLAMA_HOST, timeout=_HTTPX_TIMEOUT, limits=_HTTPX_LIMITS)
+
+
+async def close_http_clients() -> None:
+    """
+    Close the pooled HTTP connections to Ollama (called on app shutdown).
+    """
+    try:
+        _client._client.close()
+    except Exception:
+        pass
+
+    try:
+        await _async_client._client.aclose()
+    except Exception:
+        pass
+
 class EmbeddingError(Exception):
     "Custom exception for embedding-related errors"
     pass
 
+
+def _normalise_texts(texts: List[str]) -> List[str]:
+    """
+    Whitespace-normalise a list of texts and validate each one.
+
+    Raises:
+        EmbeddingError: If any text is empty or exceeds MAX_CHUNK_CHARS
+    """
+    normalised = []
+
+    for i, text in enumerate(texts):
+        if not isinstance(text, str):
+            raise ValueError("texts must be a list of strings")
+
+        # cheap length check first: normalisation never grows a string, so the
+        # raw length is a valid upper bound and oversized input is rejected
+        # before we pay the O(len) join/allocation for it. the chunker already
+        # caps its output at MAX_CHUNK_CHARS, so real chunks never trip this
+        if len(text) > MAX_CHUNK_CHARS:
+            raise EmbeddingError(f"Chunk {i} too large to embed ({len(text)} chars)")
+
+        norm = " ".join(text.split())
+        if not norm:
+            raise EmbeddingError(f"Cannot embed empty text (chunk {i})")
+
+        normalised.append(norm)
+
+    return normalised
+
+
+def _dedupe_texts(normalised: List[str]) -> Tuple[List[str], List[int]]:
+    """
+    Collapse duplicate texts before embedding.
+
+    Headers, footers and boilerplate repeat verbatim across pages after PDF
+    extraction, so embedding each occurrence wastes Ollama calls. Returns
+    the unique texts plus a mapping so results can be scattered back into
+    the original order.
+
+    Returns:
+        (unique, mapping): mapping[i] is the index into unique for texts[i]
+    """
+    seen: dict[bytes, int] = {}
+    unique: List[str] = []
+    mapping: List[int] = []
+
+    for norm in normalised:
+        h = hashlib.blake2b(norm.encode(), digest_size=16).digest()
+        if h not in seen:
+            seen[h] = len(unique)
+            unique.append(norm)
+        mapping.append(seen[h])
+
+    return unique, mapping
+
+
+def _check_embed_cache(unique: List[str]) -> Tuple[List[bytes], Dict[bytes, List[float]], List[int]]:
+    """
+    Look the unique texts up in the persistent embedding cache.
+
+    Returns:
+        (keys, hits, misses): cache keys aligned with unique, the cached
+        vectors by key, and the indices into unique that still need
+        embedding via Ollama.
+    """
+    keys = [embed_cache.make_key(EMBEDDING_MODEL, text) for text in unique]
+    hits = embed_cache.get_many(keys)
+    misses = [i for i, key in enumerate(keys) if key not in hits]
+    return keys, hits, misses
+
+
+def _merge_embed_cache(
+    unique: List[str],
+    keys: List[bytes],
+    hits: Dict[bytes, List[float]],
+    misses: List[int],
+    miss_embeddings: List[List[float]],
+) -> List[List[float]]:
+    """
+    Write freshly computed vectors back to the cache and assemble the full
+    embedding list aligned with unique.
+    """
+    embed_cache.put_many({keys[i]: emb for i, emb in zip(misses, miss_embeddings)})
+
+    embeddings: List[List[float]] = [None] * len(unique)  # type: ignore[list-item]
+    for i, key in enumerate(keys):
+        if key in hits:
+            embeddings[i] = hits[key]
+    for i, emb in zip(misses, miss_embeddings):
+        embeddings[i] = emb
+
+    return embeddings
+
+
+def _embed_one_by_one(normalised: List[str]) -> List[List[float]]:
+    """
+    Fallback path: embed each normalised text with its own Ollama call.
+
+    Only used if the batched /api/embed response comes back malformed.
+    """
+    embeddings: List[List[float]] = []
+
+    for i, norm in enumerate(normalised):
+        try:
+            resp = _client.embed(model=EMBEDDING_MODEL, input=norm)
+        except Exception as e:
+            raise EmbeddingError(f"Failed to get embedding from Ollama: {e}")
+
+        embeddings_list = resp.get("embeddings")
+        if embeddings_list is None or len(embeddings_list) == 0:
+            raise EmbeddingError(f"Ollama did not return an embedding for chunk {i}")
+
+        embeddings.append(embeddings_list[0])
+
+    return embeddings
+
+
+@functools.lru_cache(maxsize=1024)
+def _embed_single_cached(normalised: str) -> np.ndarray:
+    """
+    Embed one normalised text, memoised in-process.
+
+    Questions repeat in a Q&A UI (and across sessions for common phrasing);
+    a hit here returns without even the SQLite round-trip the persistent
+    cache costs. Keyed by the normalised string so spacing variants of the
+    same question share an entry. Callers must not mutate the returned
+    array in place - copy first.
+    """
+    return embed_texts([normalised])[0]
+
+
 def embed_text(text: str) -> List[float]:
     """
     Generate an embedding vector for a single text string (a chunk).
 
+    Thin wrapper around embed_texts so single and batch callers share the
+    same /api/embed path.
+
     Args:
         text (str): Input text to embed.
 
@@ -33,46 +202,60 @@ def embed_text(text: str) -> List[float]:
 
     if not isinstance(text, str):
         raise ValueError("text must be a string")
-    
-    # basic guard against empty text
-    normalised = " ".join(text.split())
-    if not normalised:
-        raise EmbeddingError("Cannot embed empty text")
-    
-    if len(normalised) > MAX_CHUNK_CHARS:
-        raise EmbeddingError(f"Chunk too large to embed ({len(normalised)} chars)")
 
-    try:
-        resp = ollama.embed(
-            model = EMBEDDING_MODEL,
-            input=normalised
-        )
-    except Exception as e:
-        raise EmbeddingError(f"Failed to get embedding from Ollama: {e}")
-    
-    # resp is returned as a dictionary with keys such as model, prompt, embeddings
-    # { "embeddings": [ [0.1, 0.2, ... ] ] }
-    embeddings_list = resp.get("embeddings")
-    if embeddings_list is None or len(embeddings_list) == 0:
-        raise EmbeddingError("Ollama did not return embeddings")
-    
-    # return a vector where each number in the vector represents the texts' location in a dimension: 
-    # e.g. [0.2, 0.8] means x = 0.2, y = 0.8 <- however there are 768 dimensions (e.g. technicality, similarity, etc.) 
-    return embeddings_list[0]
-
-
-def embed_texts(texts: List[str]) -> List[List[float]]:
+    norm = _normalise_texts([text])[0]
+    return _embed_single_cached(norm).tolist()
+
+
+def embed_text_np(text: str, normalise: bool = False) -> np.ndarray:
+    """
+    Generate an embedding for a single text as a float32 numpy vector.
+
+    Preferred entry point for in-process maths (semantic cache, cosine
+    similarity): downstream consumers get BLAS-backed matrix ops instead
+    of element-wise Python loops.
+
+    Args:
+        text (str): Input text to embed.
+        normalise (bool): If True, scale the vector to unit L2 length
+            (use for cosine-similarity consumers; leave False when the
+            raw magnitudes matter, e.g. for Chroma's L2 distance).
+
+    Returns:
+        np.ndarray: float32 embedding vector.
+    """
+    if not isinstance(text, str):
+        raise ValueError("text must be a string")
+
+    # copy so callers can't corrupt the cached vector
+    vec = _embed_single_cached(_normalise_texts([text])[0]).copy()
+
+    if normalise:
+        norm = np.linalg.norm(vec)
+        if norm > 0:
+            vec /= norm
+
+    return vec
+
+
+def embed_texts(texts: List[str], batch_size: int = 64) -> np.ndarray:
     """
     Generate embedding vectors for a list of text strings.
 
-    This is a simple loop-based implementation. It's fine for v0
-    and easier to debug. If needed later, we can add batching / concurrency.
+    Texts are sent to Ollama's /api/embed endpoint in batched requests of
+    up to batch_size, which collapses N HTTP round-trips into ceil(N/64)
+    without overloading the server with one giant request. If a batched
+    response comes back without embeddings (or misaligned), we fall back
+    to the old per-item loop for that batch.
 
     Args:
         texts (List[str]): List of text chunks to embed
+        batch_size (int): Max texts per Ollama request
 
     Returns :
-        List[List[float]]: List of embedding vectors aligned with input order
+        np.ndarray: float32 matrix of shape (len(texts), dims), rows
+        aligned with input order. Convert with .tolist() only at external
+        boundaries (e.g. Chroma).
 
     Raises:
         EmbeddingError: If any embedding call fails
@@ -80,17 +263,114 @@ def embed_texts(texts: List[str]) -> List[List[float]]:
 
     if not isinstance(texts, list):
         raise ValueError("texts must be a list of strings")
-    
-    embeddings: List[List[float]] = []
 
-    for i, text in enumerate(texts):
-        embeddings.append(embed_text(text))
+    if not texts:
+        raise EmbeddingError("No chunks could be embedded successfully")
+
+    normalised = _normalise_texts(texts)
+
+    # only embed each distinct chunk once; scatter results back afterwards
+    unique, mapping = _dedupe_texts(normalised)
+
+    # persistent cache: anything embedded before (any ingest, any restart)
+    # skips Ollama entirely
+    keys, hits, misses = _check_embed_cache(unique)
+    to_embed = [unique[i] for i in misses]
+
+    miss_embeddings: List[List[float]] = []
+
+    # batched requests: one round-trip per batch_size texts
+    for start in range(0, len(to_embed), batch_size):
+        batch = to_embed[start:start + batch_size]
+
+        try:
+            resp = _client.embed(model=EMBEDDING_MODEL, input=batch)
+        except Exception as e:
+            raise EmbeddingError(f"Failed to get embeddings from Ollama: {e}")
+
+        # resp is returned as a dictionary with keys such as model, prompt, embeddings
+        # { "embeddings": [ [0.1, 0.2, ... ], [0.3, 0.4, ...] ] } aligned with input order
+        embeddings_list = resp.get("embeddings")
+
+        if embeddings_list is None or len(embeddings_list) != len(batch):
+            # malformed/misaligned batch response -> fall back to one call per chunk
+            miss_embeddings.extend(_embed_one_by_one(batch))
+        else:
+            # each vector locates the text in embedding space:
+            # e.g. [0.2, 0.8] means x = 0.2, y = 0.8 <- however there are 768 dimensions
+            miss_embeddings.extend(embeddings_list)
+
+    unique_embeddings = _merge_embed_cache(unique, keys, hits, misses, miss_embeddings)
 
+    return np.asarray([unique_embeddings[m] for m in mapping], dtype=np.float32)
 
-    if not embeddings:
+
+async def embed_texts_async(texts: List[str], sub_batch: int = 32, concurrency: int = 4) -> np.ndarray:
+    """
+    Async version of embed_texts: splits the texts into fixed-size
+    sub-batches and fires them at Ollama concurrently.
+
+    A 20 MB PDF can produce thousands of chunks, which is too much for one
+    comfortable /api/embed request. Sub-batches run under a semaphore so we
+    never exceed what the Ollama server is willing to serve in parallel
+    (OLLAMA_NUM_PARALLEL).
+
+    Args:
+        texts (List[str]): List of text chunks to embed
+        sub_batch (int): Number of texts per Ollama request
+        concurrency (int): Max in-flight requests at once
+
+    Returns:
+        np.ndarray: float32 matrix of shape (len(texts), dims), rows
+        aligned with input order
+
+    Raises:
+        EmbeddingError: If any embedding call fails
+    """
+
+    if not isinstance(texts, list):
+        raise ValueError("texts must be a list of strings")
+
+    if not texts:
         raise EmbeddingError("No chunks could be embedded successfully")
-    
-    return embeddings
+
+    normalised = _normalise_texts(texts)
+
+    # only embed each distinct chunk once; scatter results back afterwards
+    unique, mapping = _dedupe_texts(normalised)
+
+    # persistent cache: anything embedded before (any ingest, any restart)
+    # skips Ollama entirely
+    keys, hits, misses = _check_embed_cache(unique)
+    to_embed = [unique[i] for i in misses]
+
+    sem = asyncio.Semaphore(concurrency)
+
+    async def _embed_batch(batch: List[str]) -> List[List[float]]:
+        async with sem:
+            try:
+                resp = await _async_client.embed(model=EMBEDDING_MODEL, input=batch)
+            except Exception as e:
+                raise EmbeddingError(f"Failed to get embeddings from Ollama: {e}")
+
+        embeddings_list = resp.get("embeddings")
+        if embeddings_list is None or len(embeddings_list) != len(batch):
+            raise EmbeddingError("Ollama returned a malformed batch of embeddings")
+
+        return list(embeddings_list)
+
+    batches = [to_embed[i:i + sub_batch] for i in range(0, len(to_embed), sub_batch)]
+
+    # gather preserves input order, so flattening keeps alignment with to_embed
+    results = await asyncio.gather(*(_embed_batch(b) for b in batches))
+
+    miss_embeddings: List[List[float]] = []
+    for batch_embeddings in results:
+        miss_embeddings.extend(batch_embeddings)
+
+    unique_embeddings = _merge_embed_cache(unique, keys, hits, misses, miss_embeddings)
+
+    return np.asarray([unique_embeddings[m] for m in mapping], dtype=np.float32)
 
 
 if __name__ == "__main__":
@@ -114,4 +394,4 @@ if __name__ == "__main__":
     print("Number of embeddings:", len(embs))
     for i, e in enumerate(embs):
         print(f"  Chunk {i}: length={len(e)}, first 3 values={e[:3]}")
-    print("-" * 70)
\ No newline at end of file
+    print("-" * 70)
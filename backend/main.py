@@ -1,14 +1,26 @@
 from fastapi import FastAPI, HTTPException, UploadFile, File, Request
-import uuid
+import asyncio
+import hashlib
+import orjson
+import numpy as np
+import uuid6
+from cachetools import TTLCache
 from pydantic import BaseModel
 import ollama
-from backend.text_chunking import chunk
-from backend.embeddings import embed_text, embed_texts
-from backend.vector_store import add_document, query_document, VectorStoreError, _get_collection
-from backend.config import CHUNK_SIZE, CHUNK_OVERLAP, MAX_CHUNK_CHARS
-from backend.text_extraction import PDFExtractionError, extract_text_from_pdf_bytes
-from backend.summariser import summarise_doc
-from fastapi.responses import HTMLResponse
+from backend.text_chunking import chunk_stream
+from backend.embeddings import embed_text_np, embed_texts_async, close_http_clients
+from backend.vector_store import (
+    add_document,
+    query_document,
+    sweep_expired_sessions,
+    VectorStoreError,
+    _get_collection,
+)
+from backend.config import CHUNK_SIZE, CHUNK_OVERLAP, MAX_CHUNK_CHARS, OLLAMA_HOST
+from backend.text_extraction import PDFExtractionError, iter_page_texts
+from backend.summariser import summarise_doc_async
+from backend import semantic_cache
+from fastapi.responses import HTMLResponse, ORJSONResponse, StreamingResponse
 from pathlib import Path
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
@@ -37,11 +49,170 @@ class AskResponse(BaseModel):
     answer: str
     sources: list[SourceChunk]
 
+
+# exact-match answer cache: a repeated (session, question) pair skips the
+# question embed, retrieval AND the LLM decode. checked before the semantic
+# cache since a dict lookup is far cheaper than a similarity scan
+_answer_cache: TTLCache = TTLCache(maxsize=1024, ttl=3600)
+
+
+def _answer_cache_key(session_id: str, question: str) -> bytes:
+    normalised = " ".join(question.split())
+    return hashlib.blake2b(f"{session_id}|{normalised}".encode(), digest_size=16).digest()
+
+
+# frozen /ask preamble, sent as the system message. keeping the static
+# instructions byte-identical across every request (no per-request
+# formatting or stripping) means the rendered prompt always starts with
+# the same token prefix, so the Ollama server's prompt cache can reuse
+# the preamble's KV state and prefill only the context + question
+_SYSTEM_PREFIX = (
+    "You are a helpful assistant answering questions about a PDF document.\n"
+    "\n"
+    "Use ONLY the information in the context below to answer the user's question.\n"
+    "If the answer is not in the context, say you don't know."
+)
+
+# per-request user message: only the dynamic parts live here
+_USER_PROMPT = (
+    "Context:\n"
+    "{context}\n"
+    "\n"
+    "Question:\n"
+    "{question}\n"
+    "\n"
+    "Answer clearly and concisely:"
+)
+
+
+# async chat client for /ask: awaiting the HTTP call (and iterating the
+# token stream asynchronously) keeps the event loop free for other requests
+# while the model decodes. reused across requests so the connection stays warm
+_chat_client = ollama.AsyncClient(host=OLLAMA_HOST)
+
+# sentinel signalling the end of the chunk stream
+_DONE = object()
+
+# embedding workers flush to Ollama once this many chunks are queued
+EMBED_BATCH_SIZE = 32
+EMBED_WORKERS = 4
+
+
+async def _ingest_pipeline(pdf_bytes: bytes) -> tuple[list[str], list[str], np.ndarray, str]:
+    """
+    Producer/consumer ingestion pipeline: overlap PDF text extraction
+    (CPU-bound, in a worker thread) with chunk embedding and document
+    summarisation (both network-bound, on the event loop).
+
+    The extraction side streams pages through chunk_stream and pushes
+    finished chunks onto an asyncio queue; embedding workers pull chunks
+    off the queue and embed them in batches while later pages are still
+    being parsed. As soon as the chunk list is complete, summarisation
+    starts alongside the in-flight embedding calls - both are I/O on the
+    Ollama socket, so the wall-clock cost is max(summary, embed), not
+    their sum.
+
+    Returns:
+        (page_texts, chunks, embeddings, summary) with embeddings aligned
+        to chunks.
+    """
+
+    queue: asyncio.Queue = asyncio.Queue(maxsize=64)
+
+    page_texts: list[str] = []
+    chunks: list[str] = []
+    embeddings_by_index: dict[int, np.ndarray] = {}
+
+    # set once extraction/chunking has produced the full chunk list
+    chunks_ready = asyncio.Event()
+
+    def _pages():
+        # collect page texts as they stream past so we can build the
+        # preview + char counts without a second extraction pass
+        for text in iter_page_texts(pdf_bytes):
+            page_texts.append(text)
+            yield text
+
+    def _next_chunk(gen):
+        try:
+            return next(gen)
+        except StopIteration:
+            return _DONE
+
+    async def producer():
+        gen = chunk_stream(_pages(), CHUNK_SIZE, CHUNK_OVERLAP)
+        while True:
+            # each next() call runs the blocking pypdf/chunking work in a thread
+            item = await asyncio.to_thread(_next_chunk, gen)
+            if item is _DONE:
+                break
+            chunks.append(item)
+            await queue.put((len(chunks) - 1, item))
+
+        # the chunk list is final: summarisation can start now, overlapping
+        # whatever embedding work is still in flight
+        chunks_ready.set()
+
+        # one sentinel per worker so they all shut down
+        for _ in range(EMBED_WORKERS):
+            await queue.put(None)
+
+    async def embed_worker():
+        batch: list[tuple[int, str]] = []
+
+        async def flush():
+            if not batch:
+                return
+            embs = await embed_texts_async([t for _, t in batch], sub_batch=EMBED_BATCH_SIZE)
+            for (idx, _), emb in zip(batch, embs):
+                embeddings_by_index[idx] = emb
+            batch.clear()
+
+        while True:
+            try:
+                item = await asyncio.wait_for(queue.get(), timeout=0.1)
+            except asyncio.TimeoutError:
+                # don't sit on a partial batch while extraction lags
+                await flush()
+                continue
+
+            if item is None:
+                await flush()
+                return
+
+            batch.append(item)
+            if len(batch) >= EMBED_BATCH_SIZE:
+                await flush()
+
+    async def summarise_when_ready() -> str:
+        await chunks_ready.wait()
+        if not chunks:
+            return ""
+        return await summarise_doc_async(chunks)
+
+    workers = [asyncio.create_task(embed_worker()) for _ in range(EMBED_WORKERS)]
+    producer_task = asyncio.create_task(producer())
+    summary_task = asyncio.create_task(summarise_when_ready())
+
+    try:
+        await asyncio.gather(producer_task, *workers, summary_task)
+    except Exception:
+        producer_task.cancel()
+        summary_task.cancel()
+        for worker in workers:
+            worker.cancel()
+        raise
+
+    embeddings = np.asarray([embeddings_by_index[i] for i in range(len(chunks))], dtype=np.float32)
+    return page_texts, chunks, embeddings, summary_task.result()
+
 # ============================================================
 # ============================ API ============================
 # ============================================================
 
-app = FastAPI()
+# orjson serialises responses in C (2-5x faster than stdlib json), which
+# matters for the chunk-heavy payloads /ingest and /ask?stream=false return
+app = FastAPI(default_response_class=ORJSONResponse)
 
 # Serve frontend static assets (CSS, JavaScript, images) from /static/*
 # Requests to /static/... are mapped to files in frontend/static/
@@ -55,58 +226,115 @@ app.mount(
 templates = Jinja2Templates(directory="frontend/templates")
 
 
+# how often the expired-session sweep runs
+SESSION_SWEEP_INTERVAL = 60 * 60
+
+_sweeper_task: asyncio.Task | None = None
+
+
+async def _session_sweeper():
+    # hourly background sweep of expired session collections; runs in a
+    # worker thread so the Chroma deletes never touch the event loop
+    while True:
+        await asyncio.sleep(SESSION_SWEEP_INTERVAL)
+        try:
+            await asyncio.to_thread(sweep_expired_sessions)
+        except Exception:
+            # a failed sweep just means the next one has more to do
+            pass
+
+
+@app.on_event("startup")
+async def startup_event():
+    # warm the Chroma client/collection singletons while the worker boots,
+    # so the first real request doesn't pay the persistence-layer open.
+    # failures are tolerated here: /health reports them and the lazy init
+    # retries on first use
+    try:
+        await asyncio.to_thread(_get_collection)
+    except Exception:
+        pass
+
+    global _sweeper_task
+    _sweeper_task = asyncio.create_task(_session_sweeper())
+
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    if _sweeper_task is not None:
+        _sweeper_task.cancel()
+
+    # release the pooled HTTP connections to Ollama
+    await close_http_clients()
+
+
 @app.post("/ingest", response_model=PDFIngestResponse)
 async def ingest_pdf(pdf_file: UploadFile = File(...)):
     # validate content tupe
     if pdf_file.content_type not in ("application/pdf", "application/x-pdf"):
         raise HTTPException(status_code=400, detail="Uploaded file must be a PDF")
 
-    # read file into memory (bytes)
+    # read the upload in 1 MB slices, counting as we go: an oversized body is
+    # rejected the moment it crosses the limit instead of after landing fully
+    # in RAM, and the buffer is the only copy of the file we hold
+    max_size_bytes = 20*1024*1024 # 20MB
+    read_size = 1024*1024 # 1MB slices
+
+    # reject from the declared size first, before reading a single byte.
+    # size comes from the multipart headers so a lying client still hits
+    # the counted check below - this just saves the honest-but-huge case
+    # from streaming 20MB we are going to throw away
+    if pdf_file.size is not None and pdf_file.size > max_size_bytes:
+        raise HTTPException(status_code=400, detail="PDF is too large (20MB limit)")
+
+    buf = bytearray()
     try:
-        pdf_bytes = await pdf_file.read() #await allows other tasks to occur whilst the file is being read
+        while True:
+            part = await pdf_file.read(read_size) #await allows other tasks to occur whilst the file is being read
+            if not part:
+                break
+            buf.extend(part)
+            if len(buf) > max_size_bytes:
+                raise HTTPException(status_code=400, detail="PDF is too large (20MB limit)")
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=400, detail=f"Failed to read uploaded file: {e}")
-    
-    # enforce a size limit of 20 MB to avoid large RAM usage
-    max_size_bytes = 20*1024*1024 # 20MB
-    if len(pdf_bytes) > max_size_bytes:
-        raise HTTPException(status_code=400, detail="PDF is too large (20MB limit)")
-    
-    # extract text + metadata
+
+    # fitz parses straight from the buffer, so no second BytesIO copy is made
+    pdf_bytes = bytes(buf)
+    del buf
+
+    # extract + chunk + embed + summarise in one overlapped pipeline
     try:
-        result = extract_text_from_pdf_bytes(pdf_bytes)
+        page_texts, chunks, embeddings, summary = await _ingest_pipeline(pdf_bytes)
     except PDFExtractionError as e:
         raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Unexpected error during PDF ingestion {e}")
 
-    full_text = result["full_text"]
-
-    # generate a session ID for this PDF
-    session_id = str(uuid.uuid4())
-
-    try:
-        # chunk the text
-        chunks = chunk(full_text, CHUNK_SIZE, CHUNK_OVERLAP)
-        if not chunks:
-            raise HTTPException(status_code=400, detail="No non-empty chunks could be created from the PDF text")
-        
-        # generate summary
-        summary = summarise_doc(chunks)
+    full_text = "\n\n".join(page_texts)
 
-        # embed the chunks
-        embeddings = embed_texts(chunks)
+    if len(full_text) == 0:
+        raise HTTPException(status_code=400, detail="No text could be extracted from the PDF (possibly image only)")
 
-        # store in vector DB
-        add_document(session_id=session_id, chunks=chunks, embeddings=embeddings)
+    if not chunks:
+        raise HTTPException(status_code=400, detail="No non-empty chunks could be created from the PDF text")
 
+    # generate a session ID for this PDF. uuid7 is time-ordered, so sessions
+    # created near-in-time cluster near-in-index in any store keyed by it
+    # (same 36-char string shape as uuid4, so nothing downstream changes)
+    session_id = str(uuid6.uuid7())
 
-    except HTTPException:
-        raise # re-raise FastAPI exceptions as is
+    try:
+        # store in vector DB (Chroma writes hit disk, so run off-loop)
+        await asyncio.to_thread(
+            add_document, session_id=session_id, chunks=chunks, embeddings=embeddings
+        )
 
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Failed during chunk/embed/store stage: {e}")
-    
+        raise HTTPException(status_code=500, detail=f"Failed during store stage: {e}")
+
     # build preview
     preview_len = 300
     preview = full_text[:preview_len]
@@ -114,28 +342,69 @@ async def ingest_pdf(pdf_file: UploadFile = File(...)):
     # return structured metadata
     return PDFIngestResponse(
         session_id=session_id,
-        pages=result["no_pages"],
-        chars=result["no_chars"],
+        pages=len(page_texts),
+        chars=len(full_text),
         preview=preview,
         summary=summary
     )
 
 
 
-@app.post("/ask", response_model=AskResponse)
-async def ask_pdf(request: AskRequest):
+def _sse_event(payload: dict) -> str:
+    """
+    Format one Server-Sent Event carrying a JSON payload.
+    """
+    # orjson here too: the sources event repeats every retrieved chunk's
+    # text, and this runs once per streamed token
+    return f"data: {orjson.dumps(payload).decode()}\n\n"
+
+
+def _ask_reply(response: AskResponse, stream: bool):
+    """
+    Shape a (possibly cached) AskResponse for the client: plain JSON for
+    stream=false, otherwise the same SSE event sequence as a live answer.
+    """
+    if not stream:
+        return response
+
+    async def replay():
+        yield _sse_event({"sources": [s.model_dump() for s in response.sources]})
+        yield _sse_event({"token": response.answer})
+        yield _sse_event({"done": True})
+
+    return StreamingResponse(replay(), media_type="text/event-stream")
 
-    # embed the question
+
+@app.post("/ask")
+async def ask_pdf(request: AskRequest, raw_request: Request, stream: bool = True):
+
+    # send an x-no-cache header to bypass both caches, e.g. for sensitive prompts
+    use_cache = "x-no-cache" not in raw_request.headers
+
+    # exact-match cache first: repeat questions return without any model call
+    cache_key = _answer_cache_key(request.session_id, request.question)
+    if use_cache and cache_key in _answer_cache:
+        return _ask_reply(_answer_cache[cache_key], stream)
+
+    # embed the question (float32 numpy vector for in-process maths).
+    # the sync HTTP call runs in a worker thread so the loop keeps serving
     try:
-        query_embedding = embed_text(request.question)
+        query_embedding = await asyncio.to_thread(embed_text_np, request.question)
 
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to embed question: {e}")
 
+    # semantic cache: near-duplicate questions skip retrieval + LLM entirely
+    if use_cache:
+        cached = semantic_cache.lookup(request.session_id, query_embedding)
+        if cached is not None:
+            return _ask_reply(cached, stream)
 
-    # retrieve the relevant chunks from vector store
+    # retrieve the relevant chunks from vector store. the in-memory fast
+    # path is quick but the Chroma fallback does disk IO, so run off-loop
     try:
-        results = query_document(
+        results = await asyncio.to_thread(
+            query_document,
             session_id=request.session_id,
             query_embedding=query_embedding,
             n_results=5
@@ -156,49 +425,74 @@ async def ask_pdf(request: AskRequest):
     if not docs:
         raise HTTPException(status_code=404, detail="No relevant chunks found for this session_id")
     
-    # build context string
-    context_parts = []
-    sources: list[SourceChunk] = []
-
-    for doc, meta in zip(docs, metas): # using zip gives you ("chunk A text", {"chunk_index": 3})
-        idx = meta.get("chunk_index")
-        context_parts.append(doc)
-        sources.append(SourceChunk(chunk_index=idx, text=doc))
-
-    context = "\n\n---\n\n".join(context_parts)
-
-    prompt = f"""
-    You are a helpful assistant answering questions about a PDF document.
-
-    Use ONLY the information in the context below to answer the user's question.
-    If the answer is not in the context, say you don't know.
-
-    Context:
-    {context}
-
-    Question:
-    {request.question}
-
-    Answer clearly and concisely:
-    """.strip()
-
-    # call local LLM via Ollama
-    try:
-        resp = ollama.chat(
-            model="llama3.2:3b",
-            messages=[{"role": "user", "content": prompt}],
-            options={"num_predict": 128, "temperature": 0.2}
-        )
-
-        answer_text = resp["message"]["content"]
-
-    except Exception as e: 
-        raise HTTPException(status_code=500, detail=f"Failed to generate answer with LLM: {e}")
-
-    return AskResponse(
-        answer=answer_text,
-        sources=sources
-    )
+    # build the sources with model_construct: the data is our own (straight
+    # out of the vector store), so pydantic validation is skipped on the hot path
+    sources = [
+        SourceChunk.model_construct(chunk_index=meta.get("chunk_index"), text=doc)
+        for doc, meta in zip(docs, metas) # using zip gives you ("chunk A text", {"chunk_index": 3})
+    ]
+
+    # docs already holds the chunk strings, so join them directly
+    context = "\n\n---\n\n".join(docs)
+
+    messages = [
+        {"role": "system", "content": _SYSTEM_PREFIX},
+        {"role": "user", "content": _USER_PROMPT.format(context=context, question=request.question)},
+    ]
+
+    def _cache_answer(answer_text: str) -> AskResponse:
+        response = AskResponse(answer=answer_text, sources=sources)
+        if use_cache:
+            _answer_cache[cache_key] = response
+            semantic_cache.store(request.session_id, query_embedding, response)
+        return response
+
+    # non-streaming fallback (?stream=false): wait for the full answer
+    if not stream:
+        try:
+            resp = await _chat_client.chat(
+                model="llama3.2:3b",
+                messages=messages,
+                options={"num_predict": 128, "temperature": 0.2}
+            )
+
+            answer_text = resp["message"]["content"]
+
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"Failed to generate answer with LLM: {e}")
+
+        return _cache_answer(answer_text)
+
+    # streaming path: the client sees the first token at prefill latency
+    # instead of waiting out the whole decode
+    async def token_stream():
+        # sources go first so the frontend can render citations immediately
+        yield _sse_event({"sources": [s.model_dump() for s in sources]})
+
+        pieces: list[str] = []
+        try:
+            # async iteration: the loop serves other requests between tokens
+            # instead of blocking on the sync client's socket reads
+            async for part in await _chat_client.chat(
+                model="llama3.2:3b",
+                messages=messages,
+                options={"num_predict": 128, "temperature": 0.2},
+                stream=True
+            ):
+                piece = part["message"]["content"]
+                if piece:
+                    pieces.append(piece)
+                    yield _sse_event({"token": piece})
+
+        except Exception as e:
+            # headers are already sent, so errors travel in-band
+            yield _sse_event({"error": f"Failed to generate answer with LLM: {e}"})
+            return
+
+        yield _sse_event({"done": True})
+        _cache_answer("".join(pieces))
+
+    return StreamingResponse(token_stream(), media_type="text/event-stream")
 
 
 @app.get("/health")
@@ -211,9 +505,11 @@ async def health_check():
 
     overall = "ok"
 
-    # check ollama (cheap call)
+    # check ollama: /api/tags just lists installed models, so liveness
+    # probes hitting /health every few seconds no longer trigger a full
+    # embedding inference on the model server
     try:
-        ollama.embed(model="llama3.2:3b", input="health check")
+        await asyncio.to_thread(ollama.list)
         status["ollama"] = "ok"
 
     except Exception:
@@ -223,7 +519,7 @@ async def health_check():
     # check vector store
     try:
         col = _get_collection()
-        _ = col.count()
+        _ = await asyncio.to_thread(col.count)
         status["vector_store"] = "ok"
 
     except Exception:
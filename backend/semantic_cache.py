@@ -0,0 +1,111 @@
+"""
+In-process semantic cache for /ask responses.
+
+Near-duplicate questions ("explain this", "summarise this PDF") are common
+in a Q&A UI, and each one normally costs a retrieval plus a full LLM decode.
+This cache keeps, per session, the embeddings of previously answered
+questions; if a new question's embedding is close enough (cosine similarity
+above a threshold) to a cached one, the cached response is returned and the
+LLM is skipped entirely.
+
+Entries carry a timestamp and expire after a TTL so stale sessions don't
+accumulate forever.
+"""
+
+import time
+from typing import Any, Dict, List, Optional, Tuple
+import numpy as np
+
+# cosine similarity above this counts as "the same question"
+SIMILARITY_THRESHOLD = 0.95
+
+# cached answers expire after an hour
+CACHE_TTL_SECONDS = 3600
+
+# {session_id: (matrix of L2-normalised question vectors [N, dims], entries)}
+# entries[i] is (timestamp, cached response) aligned with row i of the matrix
+_cache: Dict[str, Tuple[np.ndarray, List[Tuple[float, Any]]]] = {}
+
+
+def _normalise(query_embedding: List[float]) -> np.ndarray:
+    """
+    Convert an embedding to a unit-length float32 vector.
+    """
+    vec = np.asarray(query_embedding, dtype=np.float32)
+    norm = np.linalg.norm(vec)
+    if norm > 0:
+        vec = vec / norm
+    return vec
+
+
+def _sweep(session_id: str) -> None:
+    """
+    Drop expired entries for a session (and the session itself if empty).
+    """
+    if session_id not in _cache:
+        return
+
+    matrix, entries = _cache[session_id]
+    cutoff = time.time() - CACHE_TTL_SECONDS
+    keep = [i for i, (ts, _) in enumerate(entries) if ts >= cutoff]
+
+    if not keep:
+        del _cache[session_id]
+    elif len(keep) < len(entries):
+        _cache[session_id] = (matrix[keep], [entries[i] for i in keep])
+
+
+def lookup(session_id: str, query_embedding: List[float]) -> Optional[Any]:
+    """
+    Return a cached response if a sufficiently similar question was
+    answered before for this session, else None.
+
+    The similarity check is one matrix-vector product over the cached
+    question vectors (BLAS), so misses are cheap.
+    """
+    _sweep(session_id)
+
+    if session_id not in _cache:
+        return None
+
+    matrix, entries = _cache[session_id]
+    query = _normalise(query_embedding)
+
+    # vectors are unit length, so the dot product IS the cosine similarity
+    scores = matrix @ query
+    best = int(np.argmax(scores))
+
+    if scores[best] > SIMILARITY_THRESHOLD:
+        return entries[best][1]
+
+    return None
+
+
+def store(session_id: str, query_embedding: List[float], response: Any) -> None:
+    """
+    Cache a response against the question embedding that produced it.
+    """
+    query = _normalise(query_embedding).reshape(1, -1)
+
+    if session_id in _cache:
+        matrix, entries = _cache[session_id]
+        matrix = np.vstack([matrix, query])
+        entries.append((time.time(), response))
+        _cache[session_id] = (matrix, entries)
+    else:
+        _cache[session_id] = (query, [(time.time(), response)])
+
+
+if __name__ == "__main__":
+    print("=== Manual test for semantic_cache.py ===\n")
+
+    session = "test-session"
+    emb_a = [0.1, 0.2, 0.3]
+    emb_b = [0.1, 0.21, 0.29]   # nearly identical direction to emb_a
+    emb_c = [-0.5, 0.1, 0.9]    # clearly different
+
+    store(session, emb_a, "answer about topic A")
+
+    print("Lookup with near-duplicate embedding:", lookup(session, emb_b))
+    print("Lookup with unrelated embedding:", lookup(session, emb_c))
+    print("Lookup on unknown session:", lookup("other-session", emb_a))
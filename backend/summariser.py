@@ -1,10 +1,27 @@
-import ollama 
+import asyncio
+import ollama
 from typing import List
 
+from backend.config import OLLAMA_HOST
+
 SUMMARY_MODEL = "llama3.2:3b"
 
-def summarise_chunk(text: str) -> str:
-    prompt = f"""
+# max chunk summaries in flight at once; keeps us inside the Ollama
+# server's own concurrency limit (OLLAMA_NUM_PARALLEL)
+SUMMARY_CONCURRENCY = 8
+
+# max section summaries merged per reduction call. reducing in a tree with
+# bounded fan-in keeps every prompt within a fixed token budget - a 200-chunk
+# PDF no longer concatenates 200 summaries into one final prompt that blows
+# past the context window and gets silently truncated
+SUMMARY_FAN_IN = 8
+
+# reused across requests so the underlying HTTP connection stays warm
+_async_client = ollama.AsyncClient(host=OLLAMA_HOST)
+
+
+def _chunk_prompt(text: str) -> str:
+    return f"""
     Summarise the following document section.
     Focus on key points (facts, rules, procedures).
     Use concise bullet points.
@@ -15,9 +32,45 @@ def summarise_chunk(text: str) -> str:
     Summary:
     """.strip()
 
+
+def _merge_prompt(combined: str) -> str:
+    return f"""
+    Combine the following section summaries into a single concise summary.
+    Keep the key points (facts, rules, procedures) as bullet points.
+
+    Summaries:
+    {combined}
+
+    Combined summary:
+    """.strip()
+
+
+def _group(summaries: List[str]) -> List[List[str]]:
+    return [
+        summaries[i:i + SUMMARY_FAN_IN]
+        for i in range(0, len(summaries), SUMMARY_FAN_IN)
+    ]
+
+
+def _final_prompt(combined: str) -> str:
+    return f"""
+    You are producing an executive summary of a document.
+
+    Combine the ofllowing section summaries into a clear, concise, structured overview.
+
+    The executive summary should not exceed 120 words.
+
+    Summaries:
+    {combined}
+
+    Final Summary:
+    """.strip()
+
+
+def summarise_chunk(text: str) -> str:
     resp = ollama.chat(
         model=SUMMARY_MODEL,
-        messages=[{"role":"user", "content": prompt}],
+        messages=[{"role":"user", "content": _chunk_prompt(text)}],
         options={"temperature": 0.2, "num_predict": 150}
         )
 
@@ -30,25 +83,81 @@ def summarise_doc(chunks: List[str]) -> str:
         partial = summarise_chunk(chunk)
         partial_summaries.append(partial)
 
+    # reduce in a tree until one merge of at most SUMMARY_FAN_IN remains
+    while len(partial_summaries) > SUMMARY_FAN_IN:
+        merged = []
+        for group in _group(partial_summaries):
+            resp = ollama.chat(
+                model=SUMMARY_MODEL,
+                messages=[{"role":"user", "content": _merge_prompt("\n".join(group))}],
+                options={"temperature": 0.2, "num_predict": 200}
+                )
+            merged.append(resp["message"]["content"].strip())
+        partial_summaries = merged
+
     combined = "\n".join(partial_summaries)
 
-    final_prompt = f"""
-    You are producing an executive summary of a document.
+    resp = ollama.chat(
+        model=SUMMARY_MODEL,
+        messages=[{"role":"user", "content": _final_prompt(combined)}],
+        options={"temperature": 0.2, "num_predict": 250}
+        )
 
-    Combine the ofllowing section summaries into a clear, concise, structured overview.
+    return resp["message"]["content"].strip()
 
-    The executive summary should not exceed 120 words.
 
-    Summaries:
-    {combined}
+async def summarise_chunk_async(text: str) -> str:
+    resp = await _async_client.chat(
+        model=SUMMARY_MODEL,
+        messages=[{"role":"user", "content": _chunk_prompt(text)}],
+        options={"temperature": 0.2, "num_predict": 150}
+        )
 
-    Final Summary:
-    """.strip()
+    return resp["message"]["content"].strip()
 
-    resp = ollama.chat(
+
+async def summarise_doc_async(chunks: List[str]) -> str:
+    """
+    Async version of summarise_doc so summarisation can run concurrently
+    with other Ollama work (e.g. embedding) during ingestion.
+
+    Chunk summaries are independent of each other, so they all run
+    concurrently under a semaphore instead of one-at-a-time; total wall
+    time approaches n_chunks / SUMMARY_CONCURRENCY model calls. The
+    summaries are then merged as a tree with SUMMARY_FAN_IN-sized groups
+    (each level's merges also run concurrently), so every prompt stays
+    within a fixed token budget and total depth is O(log n).
+    """
+    sem = asyncio.Semaphore(SUMMARY_CONCURRENCY)
+
+    async def _bounded(chunk: str) -> str:
+        async with sem:
+            return await summarise_chunk_async(chunk)
+
+    async def _merge(group: List[str]) -> str:
+        async with sem:
+            resp = await _async_client.chat(
+                model=SUMMARY_MODEL,
+                messages=[{"role":"user", "content": _merge_prompt("\n".join(group))}],
+                options={"temperature": 0.2, "num_predict": 200}
+                )
+        return resp["message"]["content"].strip()
+
+    # gather preserves input order, so summaries stay in document order
+    partial_summaries = await asyncio.gather(*(_bounded(c) for c in chunks))
+
+    # reduce in a tree until one merge of at most SUMMARY_FAN_IN remains
+    while len(partial_summaries) > SUMMARY_FAN_IN:
+        partial_summaries = await asyncio.gather(
+            *(_merge(group) for group in _group(partial_summaries))
+        )
+
+    combined = "\n".join(partial_summaries)
+
+    resp = await _async_client.chat(
         model=SUMMARY_MODEL,
-        messages=[{"role":"user", "content": final_prompt}],
+        messages=[{"role":"user", "content": _final_prompt(combined)}],
         options={"temperature": 0.2, "num_predict": 250}
         )
-    
-    return resp["message"]["content"].strip()
\ No newline at end of file
+
+    return resp["message"]["content"].strip()
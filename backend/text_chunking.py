@@ -1,5 +1,122 @@
+import re
+from collections import deque
+from typing import Iterable, Iterator
+
+import numpy as np
+
 from backend.config import MAX_CHUNK_CHARS
 
+# one word at a time, without building the full word list str.split() returns
+_WORD_RE = re.compile(r"\S+")
+
+# documents at least this many characters take the vectorised scan path in
+# chunk(): the numpy word scan is ~an order of magnitude faster than the
+# Python word loop, at the price of O(document) working memory
+_VECTORISED_MIN_CHARS = 1 << 20
+
+
+def _validate_params(CHUNK_SIZE: int, CHUNK_OVERLAP: int) -> None:
+    if CHUNK_SIZE <= 0:
+        raise ValueError("chunk_size must be > 0")
+    if CHUNK_OVERLAP < 0:
+        raise ValueError("overlap must be >= 0")
+    if CHUNK_OVERLAP >= CHUNK_SIZE:
+        raise ValueError("overlap must be smaller than chunk_size")
+
+
+def _build_chunk(words: Iterable[str]) -> str:
+    chunk_text = " ".join(words)
+
+    # ensure that the number of characters is below the ollama threshold
+    if len(chunk_text) > MAX_CHUNK_CHARS:
+        chunk_text = chunk_text[:MAX_CHUNK_CHARS]
+
+    return chunk_text
+
+
+def chunk_stream(page_texts: Iterable[str], CHUNK_SIZE: int, CHUNK_OVERLAP: int) -> Iterator[str]:
+    """
+    Streaming version of chunk(): consume page texts one at a time and
+    yield each chunk as soon as its window of words is complete.
+
+    This lets chunking (and anything consuming the chunks, e.g. embedding)
+    start before the whole document has been extracted. Windows and overlap
+    match chunk() run on the joined document text, except that a trailing
+    window containing nothing but already-emitted overlap words is skipped.
+
+    Args:
+        page_texts (Iterable[str]): Page texts in document order.
+        CHUNK_SIZE (int): Target number of words per chunk.
+        CHUNK_OVERLAP (int): Number of words to overlap between chunks.
+
+    Yields:
+        str: Text chunks in document order.
+    """
+
+    _validate_params(CHUNK_SIZE, CHUNK_OVERLAP)
+
+    step = CHUNK_SIZE - CHUNK_OVERLAP
+
+    # rolling buffer of words not yet emitted in a complete window
+    buffer: list[str] = []
+    yielded_any = False
+
+    for page_text in page_texts:
+        if not isinstance(page_text, str):
+            raise ValueError("page texts must be strings")
+
+        buffer.extend(m.group(0) for m in _WORD_RE.finditer(page_text))
+
+        while len(buffer) >= CHUNK_SIZE:
+            yield _build_chunk(buffer[:CHUNK_SIZE])
+            yielded_any = True
+            del buffer[:step]
+
+    # trailing words: everything after the last full window. If only the
+    # overlap is left, the final window already covered those words.
+    if buffer and (len(buffer) > CHUNK_OVERLAP or not yielded_any):
+        yield _build_chunk(buffer)
+
+
+def _chunk_vectorised(text: str, CHUNK_SIZE: int, CHUNK_OVERLAP: int) -> list[str]:
+    """
+    chunk() fast path for very large documents: find every word boundary
+    with one vectorised numpy scan instead of a Python loop over words.
+
+    The normalised text is viewed as a uint32 code-point array (so offsets
+    index the string directly, multi-byte characters included), the space
+    positions fall out of a single comparison, and each chunk is then one
+    slice of the normalised string. Output is identical to the streaming
+    path; the trade-off is O(document) working memory, which is why small
+    documents stay on the deque.
+    """
+    normalised = " ".join(text.split())
+    if not normalised:
+        return []
+
+    codepoints = np.frombuffer(normalised.encode("utf-32-le"), dtype=np.uint32)
+    spaces = np.flatnonzero(codepoints == ord(" "))
+
+    # word k spans offsets[k] : offsets[k + 1] - 1 (sentinel covers the last word)
+    offsets = np.empty(len(spaces) + 2, dtype=np.int64)
+    offsets[0] = 0
+    offsets[1:-1] = spaces + 1
+    offsets[-1] = len(normalised) + 1
+
+    no_words = len(offsets) - 1
+    if no_words <= CHUNK_SIZE:
+        return [normalised[:MAX_CHUNK_CHARS]]
+
+    step = CHUNK_SIZE - CHUNK_OVERLAP
+    window_starts = np.arange(0, no_words, step)
+    window_ends = np.minimum(window_starts + CHUNK_SIZE, no_words)
+
+    return [
+        normalised[offsets[a] : offsets[b] - 1][:MAX_CHUNK_CHARS]
+        for a, b in zip(window_starts, window_ends)
+    ]
+
+
 def chunk(text: str, CHUNK_SIZE: int, CHUNK_OVERLAP: int) -> list[str]:
     """
     Split large text into overlapping word-based chunks.
@@ -16,47 +133,40 @@ def chunk(text: str, CHUNK_SIZE: int, CHUNK_OVERLAP: int) -> list[str]:
     # input validation
     if not isinstance(text, str):
         raise ValueError("Text must be a string")
-    if CHUNK_SIZE <= 0:
-        raise ValueError("chunk_size must be > 0")
-    if CHUNK_OVERLAP < 0:
-        raise ValueError("overlap must be >= 0")
-    if CHUNK_OVERLAP >= CHUNK_SIZE:
-        raise ValueError("overlap must be smaller than chunk_size")
+    _validate_params(CHUNK_SIZE, CHUNK_OVERLAP)
 
-    # normalise white spaces
-    normalised = " ".join(text.split())
-    if not normalised: #if empty string, then the pdf has no chars
-        return []
-
-    words = normalised.split()
-    no_words = len(words)
+    # big documents: one vectorised scan beats the per-word Python loop
+    if len(text) >= _VECTORISED_MIN_CHARS:
+        return _chunk_vectorised(text, CHUNK_SIZE, CHUNK_OVERLAP)
 
-    # if too short, return as a single chunk
-    if no_words <= CHUNK_SIZE:
-        return [normalised]
-    
-    #sliding window approach
-    chunks = []
-    start = 0
     step = CHUNK_SIZE - CHUNK_OVERLAP
 
-    while start < no_words:
-        end = start + CHUNK_SIZE
-        chunk_words = words[start:end]
+    # stream words straight off the regex iterator through a bounded window:
+    # peak extra memory is O(CHUNK_SIZE) words instead of a normalised copy
+    # of the whole document plus its full word list. joining each window
+    # normalises its whitespace, so chunks match the old normalise-then-split
+    # output exactly
+    window: deque[str] = deque()
+    chunks: list[str] = []
 
-        if not chunk_words: #defensive guardrail incase earlier code ever changed
-            break
-        
-        chunk_text = " ".join(chunk_words).strip()
+    for match in _WORD_RE.finditer(text):
+        if len(window) == CHUNK_SIZE:
+            # window is full and more words are coming: emit it and slide
+            chunks.append(_build_chunk(window))
+            for _ in range(step):
+                window.popleft()
 
-        if chunk_text:
-            # ensure that the number of characters is below the ollama threshold
-            if len(chunk_text) > MAX_CHUNK_CHARS:
-                chunk_text = chunk_text[:MAX_CHUNK_CHARS]
+        window.append(match.group(0))
 
-            chunks.append(chunk_text)
+    if not chunks:
+        # the whole document fits in one window (or is empty)
+        return [_build_chunk(window)] if window else []
 
-        start += step
+    # trailing windows: keep sliding until every word has led a chunk
+    while window:
+        chunks.append(_build_chunk(window))
+        for _ in range(min(step, len(window))):
+            window.popleft()
 
     return chunks
 
@@ -1,46 +1,145 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
 from io import BytesIO
-from pypdf import PdfReader
+from typing import Iterator
+import fitz  # PyMuPDF: C-backed, ~5-10x faster than pypdf on text-heavy PDFs
+from pypdf import PdfReader # fallback for PDFs MuPDF refuses to open
+
+# PDFs below this page count are extracted serially: the parallel path's
+# extra document opens aren't worth it for small documents
+PARALLEL_MIN_PAGES = 20
+
+# pages per parallel task: each task opens its own document handle, so
+# batching a range of pages amortises that open across several pages
+PAGE_BATCH = 8
+
+# shared pool, reused across requests to avoid per-request spin-up cost.
+# threads (not processes) because MuPDF releases the GIL during extraction
+_EXECUTOR = ThreadPoolExecutor(max_workers=os.cpu_count())
 
 class PDFExtractionError(Exception):
     "custom exception for PDF extraction problems"
     pass
 
-def extract_text_from_pdf_bytes(pdf_bytes: bytes) -> dict:
-    """
-    Extract text and metadata from a PDF loaded as bytes
-    Returns:
-        dict: {full_text, no_pages, no_chars}
-    Raises PDFExtractionError for known problems
+
+def _extract_page_range(pdf_bytes: bytes, page_range: range) -> list[str]:
     """
+    Extract the text of a contiguous range of pages. Worker for the
+    parallel path.
 
+    MuPDF documents are not thread-safe, so each task opens its own
+    document handle from the shared bytes and walks its page range with it.
+    """
+    doc = fitz.open(stream=pdf_bytes, filetype="pdf")
     try:
-        pdf_stream = BytesIO(pdf_bytes) # wrap bytes in a file like object
-        reader = PdfReader(pdf_stream) # read the file into an object
+        texts = []
+        for i in page_range:
+            try:
+                text = doc[i].get_text("text")
+            except Exception as e:
+                raise PDFExtractionError(f"Failed to extract text from page {i}: {e}")
+
+            texts.append(text or "")
 
+        return texts
+    finally:
+        doc.close()
+
+
+def _iter_page_texts_pypdf(pdf_bytes: bytes) -> Iterator[str]:
+    """
+    Fallback extractor on pypdf, for documents MuPDF refuses to open.
+    pypdf is slower but tolerates some malformed files, so a failed fitz
+    open degrades to slow extraction instead of a hard error.
+    """
+    try:
+        reader = PdfReader(BytesIO(pdf_bytes))
     except Exception as e:
         raise PDFExtractionError(f"Failed to read PDF: {e}")
-    
 
     if reader.is_encrypted:
         # not going to decrypt in V0
         raise PDFExtractionError(f"Failed to read PDF due to encryption")
-    
 
-    pages_text = []
     for i, page in enumerate(reader.pages):
         try:
             text = page.extract_text()
         except Exception as e:
             raise PDFExtractionError(f"Failed to extract text from page {i}: {e}")
-        
-        #handle image-only/no text
-        if text is None:
-            text = ""
 
-        pages_text.append(text)
+        yield text or ""
+
+
+def iter_page_texts(pdf_bytes: bytes) -> Iterator[str]:
+    """
+    Lazily yield the text of each page of a PDF loaded as bytes.
+
+    Pages are extracted one at a time so downstream consumers (chunking,
+    embedding) can start working before the whole document is parsed.
+    Large documents fan pages out across a thread pool (page extraction is
+    embarrassingly parallel); results still arrive in page order.
+    Raises PDFExtractionError for known problems
+    """
+
+    try:
+        doc = fitz.open(stream=pdf_bytes, filetype="pdf") # parse straight from memory
+    except Exception:
+        # MuPDF rejects some malformed-but-recoverable files; retry with pypdf
+        yield from _iter_page_texts_pypdf(pdf_bytes)
+        return
+
+    if doc.needs_pass:
+        # not going to decrypt in V0
+        doc.close()
+        raise PDFExtractionError(f"Failed to read PDF due to encryption")
+
+    no_pages = len(doc)
+
+    if no_pages < PARALLEL_MIN_PAGES:
+        # serial path: reuse the handle we already opened
+        try:
+            for i in range(no_pages):
+                try:
+                    text = doc[i].get_text("text")
+                except Exception as e:
+                    raise PDFExtractionError(f"Failed to extract text from page {i}: {e}")
+
+                #handle image-only/no text
+                if text is None:
+                    text = ""
+
+                yield text
+        finally:
+            # free the MuPDF document promptly rather than waiting for GC
+            doc.close()
+        return
+
+    # parallel path: workers open their own handles, so release this one
+    doc.close()
+
+    ranges = [
+        range(start, min(start + PAGE_BATCH, no_pages))
+        for start in range(0, no_pages, PAGE_BATCH)
+    ]
+
+    # map yields in page order while later ranges extract ahead on the pool
+    for texts in _EXECUTOR.map(partial(_extract_page_range, pdf_bytes), ranges):
+        yield from texts
+
+
+def extract_text_from_pdf_bytes(pdf_bytes: bytes) -> dict:
+    """
+    Extract text and metadata from a PDF loaded as bytes
+    Returns:
+        dict: {full_text, no_pages, no_chars}
+    Raises PDFExtractionError for known problems
+    """
+
+    pages_text = list(iter_page_texts(pdf_bytes))
 
     full_text = "\n\n".join(pages_text)
-    no_pages = len(reader.pages)
+    no_pages = len(pages_text)
     no_chars = len(full_text)
 
     if no_chars == 0:
@@ -51,4 +150,3 @@ def extract_text_from_pdf_bytes(pdf_bytes: bytes) -> dict:
         "no_pages": no_pages,
         "no_chars": no_chars
     }
-
@@ -3,14 +3,18 @@ Vector store utilities using ChromaDB for a PDF RAG system.
 
 Responsibilities:
 - Initialize a persistent Chroma client
-- Provide access to a single collection for PDF chunks
+- Keep one collection per session so queries scan a single document
 - Add document chunks + embeddings to the collection
 - Query most similar chunks for a given session and query embedding
+- Expire old sessions (collection + in-memory index) on a TTL
 """
 
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional, Union
 import os
+import threading
+import time
 import chromadb
+import numpy as np
 from chromadb.config import Settings
 
 
@@ -21,6 +25,22 @@ from chromadb.config import Settings
 PERSIST_DIRECTORY = "./chroma_db"
 COLLECTION_NAME = "pdf_chunks"
 
+# rows per Chroma write: insert throughput peaks at moderate batch sizes,
+# and one giant transaction for a thousand-chunk PDF stalls the store
+ADD_BATCH_SIZE = 256
+
+# each session gets its own collection, named with this prefix. searching a
+# per-session collection scans only that document's vectors, instead of a
+# kNN over every session followed by a where-filter
+SESSION_COLLECTION_PREFIX = "pdf_"
+
+# sessions older than this are swept (collection + in-memory index)
+SESSION_TTL_SECONDS = 24 * 60 * 60
+
+# documents with at least this many chunks build their ids in one numpy
+# call; below it the plain comprehension is just as fast
+VECTORISED_IDS_MIN = 1000
+
 class VectorStoreError(Exception):
     """
     Custom exception for vector store related problems.
@@ -32,37 +52,87 @@ class VectorStoreError(Exception):
 # Client / Collection #
 # ====================#
 
+# module-level singletons: client init opens the persistence layer and
+# allocates indexes, which is far too expensive to repeat on every request
+_client = None
+_collection = None
+_init_lock = threading.Lock()
+
+# in-memory per-session search index: {session_id: (fp16 matrix, fp32 row
+# norms, chunks)}. similarity search is memory-bandwidth-bound, so storing
+# the vectors at float16 halves the bytes scanned per query (rounding is
+# well within noise for a top-5 retrieval). Chroma stays the durable store;
+# sessions not in memory (e.g. after a restart) fall back to querying it
+_session_index: Dict[str, tuple] = {}
+
+
 def _get_chroma_client() -> chromadb.Client:
     """
-    Initialise and return a chroma client with persistent storage
+    Return the shared chroma client, initialising it (with persistent
+    storage) on first use.
     """
-    os.makedirs(PERSIST_DIRECTORY, exist_ok=True)
+    global _client
 
-    client = chromadb.Client(
-        Settings(
-            persist_directory = PERSIST_DIRECTORY,
-        )
-    )
-    return client
+    if _client is None:
+        with _init_lock:
+            if _client is None: # re-check under the lock
+                os.makedirs(PERSIST_DIRECTORY, exist_ok=True)
+                _client = chromadb.Client(
+                    Settings(
+                        persist_directory = PERSIST_DIRECTORY,
+                    )
+                )
+
+    return _client
 
 def _get_collection():
     """
-    Get or create the main collection used for storing PDF chunks
+    Return the main collection used for storing PDF chunks, creating it on
+    first use and reusing the handle afterwards.
 
     Returns:
         A Chroma collection object
     """
+    global _collection
 
     client = _get_chroma_client()
-    collection = client.get_or_create_collection(name=COLLECTION_NAME)
-    return collection
+
+    if _collection is None:
+        with _init_lock:
+            if _collection is None: # re-check under the lock
+                _collection = client.get_or_create_collection(name=COLLECTION_NAME)
+
+    return _collection
+
+
+def _session_collection_name(session_id: str) -> str:
+    return f"{SESSION_COLLECTION_PREFIX}{session_id}"
+
+
+def _session_age_seconds(session_id: str) -> Optional[float]:
+    """
+    Age of a session, recovered from its uuid7 session_id (the first 48
+    bits are milliseconds since the epoch). Returns None for ids that are
+    not uuid7s (e.g. manual-test sessions), which are never swept.
+    """
+    try:
+        ms = int(session_id.replace("-", "")[:12], 16)
+    except ValueError:
+        return None
+
+    age = time.time() - ms / 1000.0
+    # a nonsense hex prefix decodes to a time far in the future or past;
+    # only trust plausible ages
+    if age < 0:
+        return None
+    return age
 
 
 # ===================#
 # Public API         #
 # ===================#
 
-def add_document(session_id: str, chunks: List[str], embeddings: List[List[float]]) -> None:
+def add_document(session_id: str, chunks: List[str], embeddings: Union[List[List[float]], np.ndarray]) -> None:
     """
     Add a document's chunks and embeddings to the vector store. Ensures that the index's align.
 
@@ -75,7 +145,8 @@ def add_document(session_id: str, chunks: List[str], embeddings: List[List[float
     Args:
         session_id (str): Unique ID representing this PDF/document
         chunks (List[str]): List of chunked text segments
-        embeddings (List[List[float]]): List of embedding vectors corresponding 1:1 with chunks
+        embeddings: List of embedding vectors (or a float32 numpy matrix)
+            corresponding 1:1 with chunks
 
     Raises:
         VectorStoreError: If validation fails or Chroma operations fail
@@ -84,7 +155,7 @@ def add_document(session_id: str, chunks: List[str], embeddings: List[List[float
     if not session_id or not isinstance(session_id, str):
         raise VectorStoreError("session_id must be a non-empty string")
     
-    if not isinstance(chunks, list) or not isinstance(embeddings, list):
+    if not isinstance(chunks, list) or not isinstance(embeddings, (list, np.ndarray)):
         raise VectorStoreError("chunks or embeddings must be lists")
     
     if len(chunks) == 0:
@@ -96,32 +167,58 @@ def add_document(session_id: str, chunks: List[str], embeddings: List[List[float
             f"number of embeddings ({len(embeddings)})"
         )
     
-    collection = _get_collection()
+    # one collection per session: queries then scan this document's vectors
+    # only, however many other sessions the store holds
+    try:
+        collection = _get_chroma_client().get_or_create_collection(
+            name=_session_collection_name(session_id)
+        )
+    except Exception as e:
+        raise VectorStoreError(f"Failed to create session collection: {e}")
+
+    # ids share one prefix, so for big documents a single np.char.add builds
+    # them all in C instead of formatting thousands of f-strings
+    if len(chunks) >= VECTORISED_IDS_MIN:
+        ids = np.char.add(f"{session_id}_", np.arange(len(chunks)).astype(str)).tolist()
+    else:
+        ids = [f"{session_id}_{i}" for i in range(len(chunks))]
 
-    ids = [f"{session_id}_{i}" for i in range(len(chunks))]
     metadatas = [
         {"session_id": session_id, "chunk_index": i} for i in range(len(chunks))
     ]
 
+    # hand Chroma one contiguous float32 matrix: its bulk add path is
+    # numpy-backed, so this skips per-row list coercion entirely
+    embeddings = np.ascontiguousarray(embeddings, dtype=np.float32)
+
+    # write in slices of ADD_BATCH_SIZE rows. upsert (rather than add) makes
+    # a retried ingest for the same session idempotent instead of a
+    # duplicate-id error
     try:
-        collection.add(
-            ids = ids,
-            documents = chunks,
-            embeddings = embeddings,
-            metadatas = metadatas,
-        )
+        for start in range(0, len(chunks), ADD_BATCH_SIZE):
+            stop = start + ADD_BATCH_SIZE
+            collection.upsert(
+                ids = ids[start:stop],
+                documents = chunks[start:stop],
+                embeddings = embeddings[start:stop],
+                metadatas = metadatas[start:stop],
+            )
     except Exception as e:
         raise VectorStoreError(f"Failed to add document to vector store: {e}")
-    
-    print("collection count (add doc):", collection.count())
-    
-def query_document(session_id: str, query_embedding: List[float], n_results: int = 5) -> Dict[str, Any]:
+
+    # build the in-memory fp16 index for this session's query path. row
+    # norms are precomputed (in float32) so queries rank by L2 distance
+    # with one matrix-vector product instead of materialising differences
+    row_norms = (embeddings * embeddings).sum(axis=1)
+    _session_index[session_id] = (embeddings.astype(np.float16), row_norms, list(chunks))
+
+def query_document(session_id: str, query_embedding: Union[List[float], np.ndarray], n_results: int = 5) -> Dict[str, Any]:
     """
     Query the vector store for the most similar chunks within a given session.
 
     Args:
         session_id (str): ID of the document/session to search within.
-        query_embedding (List[float]): Embedding vector for the query.
+        query_embedding: Embedding vector for the query (list or numpy).
         n_results (int): Number of top results to retreive.
 
     Returns:
@@ -133,27 +230,101 @@ def query_document(session_id: str, query_embedding: List[float], n_results: int
     if not session_id or not isinstance(session_id, str):
         raise VectorStoreError("session_id must be a non-empty string")
     
-    if not isinstance(query_embedding, list) or len(query_embedding) == 0:
+    if not isinstance(query_embedding, (list, np.ndarray)) or len(query_embedding) == 0:
         raise VectorStoreError("query_embedding must be a non-empty list of floats")
-    
+
     if n_results <= 0:
         raise VectorStoreError("n_results must be > 0")
-    
-    collection = _get_collection()
+
+    # fast path: search the in-memory fp16 matrix for this session.
+    # |q|^2 is constant across rows so ranking by |v|^2 - 2*v.q matches
+    # ranking by L2 distance. only the stored side is quantised - the query
+    # stays float32, so numpy promotes the product and the only rounding is
+    # the one we chose when the matrix was stored
+    entry = _session_index.get(session_id)
+    if entry is not None:
+        matrix, row_norms, session_chunks = entry
+
+        query = np.asarray(query_embedding, dtype=np.float32)
+        dists = row_norms - 2.0 * (matrix @ query)
+
+        k = min(n_results, len(session_chunks))
+        top = np.argpartition(dists, k - 1)[:k]
+        top = top[np.argsort(dists[top])]
+
+        return {
+            "documents": [[session_chunks[i] for i in top]],
+            "metadatas": [[{"session_id": session_id, "chunk_index": int(i)} for i in top]],
+            "distances": [dists[top].tolist()],
+        }
+
+    # the session's own collection holds only its vectors, so no
+    # where-filter (and no scan of other sessions) is needed
+    try:
+        collection = _get_chroma_client().get_collection(
+            name=_session_collection_name(session_id)
+        )
+    except Exception:
+        raise VectorStoreError(f"No document found for session {session_id}")
+
+    # convert to a plain list only here, at the Chroma boundary
+    if isinstance(query_embedding, np.ndarray):
+        query_embedding = query_embedding.tolist()
 
     # ChromaDBs .query() method and returns the matched chunks + metadata
     try:
         results = collection.query(
             query_embeddings = [query_embedding], #Chroma expects a list of embedding vectors (lists), even if there's only one query.
             n_results = n_results,
-            where={"session_id": session_id},
         )
     except Exception as e:
         raise VectorStoreError(f"Failed to query vector store: {e}")
 
-    print("collection count (query doc):", collection.count())
-
     return results
+
+
+def delete_session(session_id: str) -> None:
+    """
+    Drop a session's collection and its in-memory index entry.
+    """
+    _session_index.pop(session_id, None)
+
+    try:
+        _get_chroma_client().delete_collection(name=_session_collection_name(session_id))
+    except Exception:
+        # already gone (or never stored) - nothing to clean up
+        pass
+
+
+def sweep_expired_sessions(ttl_seconds: float = SESSION_TTL_SECONDS) -> int:
+    """
+    Delete every session collection older than ttl_seconds.
+
+    Session age comes straight from the uuid7 session_id embedded in the
+    collection name, so nothing extra needs to be tracked - a sweep after
+    a restart still finds sessions created before it.
+
+    Returns:
+        int: Number of sessions deleted.
+    """
+    try:
+        collections = _get_chroma_client().list_collections()
+    except Exception:
+        return 0
+
+    swept = 0
+    for col in collections:
+        name = getattr(col, "name", col)
+        if not name.startswith(SESSION_COLLECTION_PREFIX):
+            continue
+
+        session_id = name[len(SESSION_COLLECTION_PREFIX):]
+        age = _session_age_seconds(session_id)
+        if age is not None and age > ttl_seconds:
+            delete_session(session_id)
+            swept += 1
+
+    return swept
     
 
 
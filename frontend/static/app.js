@@ -23,28 +23,64 @@ function handleIngestSuccess(data) {
 }
 
 
-function handleAskSuccess(data) {
-    askButton.disabled = false;
-    askStatus.textContent = "";
-
-    const answerSection = document.getElementById("answer-section");
-    const answerText = document.getElementById("answer-text");
+function renderSources(sources) {
     const sourcesContainer = document.getElementById("sources-container");
 
-    answerText.textContent = data.answer;
-
     // clear old sources
     sourcesContainer.innerHTML = "<h3>Sources</h3>";
 
-    data.sources.forEach((src) => {
+    sources.forEach((src) => {
         const div = document.createElement("div");
         div.className = "source";
         const preview = src.text.length > 300 ? src.text.slice(0,300) + "..." : src.text;
         div.textContent = `chunk ${src.chunk_index}: ${preview}`;
         sourcesContainer.appendChild(div);
     });
+}
 
-    answerSection.style.display = "block";
+
+// the /ask endpoint streams Server-Sent Events: a sources event first,
+// then token events as the model generates, then a done event. render
+// tokens as they arrive so the answer appears immediately.
+async function handleAskStream(response) {
+    const answerSection = document.getElementById("answer-section");
+    const answerText = document.getElementById("answer-text");
+
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = "";
+    let answer = "";
+
+    answerText.textContent = "";
+
+    while (true) {
+        const { done, value } = await reader.read();
+        if (done) break;
+
+        buffer += decoder.decode(value, { stream: true });
+
+        // events are separated by a blank line; keep any partial event
+        const events = buffer.split("\n\n");
+        buffer = events.pop();
+
+        for (const event of events) {
+            if (!event.startsWith("data: ")) continue;
+            const payload = JSON.parse(event.slice(6));
+
+            if (payload.sources) {
+                renderSources(payload.sources);
+                answerSection.style.display = "block";
+                askStatus.textContent = "";
+            } else if (payload.token) {
+                answer += payload.token;
+                answerText.textContent = answer;
+            } else if (payload.error) {
+                throw new Error(payload.error);
+            }
+        }
+    }
+
+    askButton.disabled = false;
 }
 
 
@@ -153,8 +189,7 @@ askForm.addEventListener("submit", async (event) => {
             throw new Error(error.detail || "Failed to get answer");
         }
 
-        const data = await response.json();
-        handleAskSuccess(data);
+        await handleAskStream(response);
 
     } catch (err) {
         askStatus.textContent = err.message;